@@ -0,0 +1,31 @@
+"""Redis client shared by every request"""
+from typing import Optional
+
+import redis.asyncio as redis
+
+# Bounded pool; idle connections are pinged before reuse after 30s
+REDIS_POOL_OPTIONS = {
+    "max_connections": 50,
+    "health_check_interval": 30,
+}
+
+_redis: Optional[redis.Redis] = None
+
+def connect_to_redis(redis_url: str) -> redis.Redis:
+    """Create the process-wide client (called once from the app lifespan)"""
+    global _redis
+    _redis = redis.from_url(redis_url, decode_responses=True, **REDIS_POOL_OPTIONS)
+    return _redis
+
+async def close_redis_connection() -> None:
+    """Close the client and disconnect its pool"""
+    global _redis
+    if _redis is not None:
+        await _redis.close()
+    _redis = None
+
+async def get_redis() -> redis.Redis:
+    """FastAPI dependency returning the shared Redis client"""
+    if _redis is None:
+        raise RuntimeError("Redis is not connected")
+    return _redis
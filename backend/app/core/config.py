@@ -1,9 +1,41 @@
-from pydantic_settings import BaseSettings
-from typing import List, Optional
-from functools import lru_cache
+from pydantic_settings import BaseSettings, DotEnvSettingsSource, EnvSettingsSource, SettingsConfigDict
+from typing import FrozenSet, Iterable, List, Mapping, Optional
+from functools import cached_property
+from dotenv import dotenv_values
 import os
+import re
 from pathlib import Path
 
+ENV_FILE = ".env"
+
+# Parsed once per process; Settings instances read from this mapping
+# instead of re-opening and re-parsing the file on every construction.
+_dotenv_values = dotenv_values(ENV_FILE)
+
+def compile_origin_regex(origins: Iterable[str]) -> re.Pattern:
+    """Compile CORS origins into one pattern ('*' matches one subdomain label)"""
+    patterns = (re.escape(origin).replace(r"\*", r"[a-z0-9-]+") for origin in origins)
+    return re.compile("(?:" + "|".join(patterns) + ")")
+
+class _CommaListMixin:
+    """Accept comma-separated values (CORS_ORIGINS=a,b) for list fields as well as JSON"""
+
+    def prepare_field_value(self, field_name, field, value, value_is_complex):
+        if isinstance(value, str) and self._field_is_complex(field)[0] and not value.lstrip().startswith(("[", "{")):
+            return [item.strip() for item in value.split(",") if item.strip()]
+        return super().prepare_field_value(field_name, field, value, value_is_complex)
+
+class _EnvSettingsSource(_CommaListMixin, EnvSettingsSource):
+    """Environment settings source with comma-separated lists"""
+
+class _ParsedDotEnvSettingsSource(_CommaListMixin, DotEnvSettingsSource):
+    """Dotenv settings source backed by the values parsed at import"""
+
+    def _read_env_files(self, case_sensitive: bool) -> Mapping[str, Optional[str]]:
+        if case_sensitive:
+            return dict(_dotenv_values)
+        return {key.lower(): value for key, value in _dotenv_values.items()}
+
 class Settings(BaseSettings):
     """Application settings with environment variable support"""
     
@@ -19,6 +51,8 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 30
+    # Build the authenticated user with model_construct() instead of validating it
+    lean_user_construction: bool = False
     
     # Database
     mongodb_url: str = "mongodb://localhost:27017"
@@ -59,7 +93,7 @@ class Settings(BaseSettings):
     
     # File Upload
     max_file_size: int = 50 * 1024 * 1024  # 50MB
-    allowed_extensions: List[str] = [".jpg", ".jpeg", ".png", ".gif", ".mp4", ".webm"]
+    allowed_extensions: FrozenSet[str] = frozenset({".jpg", ".jpeg", ".png", ".gif", ".mp4", ".webm"})
     
     # Social Features
     viral_threshold: int = 1000  # Minimum votes pentru NFT auto-minting
@@ -74,16 +108,22 @@ class Settings(BaseSettings):
     cors_origins: List[str] = [
         "http://localhost:3000",
         "https://*.vercel.app",
-        "https://viralsafe.io"
+        "https://viralsafe.io",
+        "https://*.onrender.com"
     ]
     
     # Cloud Deploy (Free Tier Optimized)
     # Railway, Render, Heroku free alternatives
     deploy_platform: str = "railway"  # railway, render, vercel-functions
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    # env_file is left unset: .env values come from _ParsedDotEnvSettingsSource.
+    # Variables are matched case-insensitively (MONGODB_URL -> mongodb_url) and
+    # unrelated deployment variables are ignored
+    model_config = SettingsConfigDict(case_sensitive=False, extra="ignore")
+    
+    @classmethod
+    def settings_customise_sources(cls, settings_cls, init_settings, env_settings, dotenv_settings, file_secret_settings):
+        return init_settings, _EnvSettingsSource(settings_cls), _ParsedDotEnvSettingsSource(settings_cls), file_secret_settings
         
     def get_database_url(self) -> str:
         """Get formatted database URL"""
@@ -93,6 +133,15 @@ class Settings(BaseSettings):
         """Get formatted Redis URL"""
         return self.redis_url
     
+    @cached_property
+    def cors_origin_regex(self) -> re.Pattern:
+        """Compiled pattern matching any CORS origin ('*' matches one subdomain label)"""
+        return compile_origin_regex(self.cors_origins)
+    
+    def is_extension_allowed(self, filename: str) -> bool:
+        """Check an upload filename against allowed_extensions"""
+        return Path(filename).suffix.lower() in self.allowed_extensions
+    
     def is_production(self) -> bool:
         """Check if running in production"""
         return self.environment.lower() == "production"
@@ -112,6 +161,7 @@ class ProductionSettings(Settings):
     environment: str = "production"
     debug: bool = False
     log_level: str = "INFO"
+    lean_user_construction: bool = True
     # În production, toate secretele vin din environment variables
     
 # Test settings
@@ -120,17 +170,19 @@ class TestSettings(Settings):
     database_name: str = "viralsafe_test"
     redis_url: str = "redis://localhost:6379/1"
 
-@lru_cache()
-def get_settings() -> Settings:
-    """Get settings based on environment"""
-    environment = os.getenv("ENVIRONMENT", "development").lower()
-    
-    if environment == "production":
-        return ProductionSettings()
-    elif environment == "test":
-        return TestSettings()
-    else:
-        return DevelopmentSettings()
+_SETTINGS_BY_ENVIRONMENT = {
+    "production": ProductionSettings,
+    "test": TestSettings,
+}
+
+def _load_settings() -> Settings:
+    """Instantiate the settings class for the current environment"""
+    environment = (os.getenv("ENVIRONMENT") or _dotenv_values.get("ENVIRONMENT") or "development").lower()
+    return _SETTINGS_BY_ENVIRONMENT.get(environment, DevelopmentSettings)()
 
 # Export settings instance
-settings = get_settings()
\ No newline at end of file
+settings = _load_settings()
+
+def get_settings() -> Settings:
+    """Get settings based on environment (process-wide singleton)"""
+    return settings
@@ -0,0 +1,37 @@
+"""MongoDB client shared by every request"""
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+# Pool and wire settings; unavailable compressors are skipped by the driver
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": 50,
+    "minPoolSize": 5,
+    "serverSelectionTimeoutMS": 2000,
+    "compressors": "zstd,snappy",
+    "retryWrites": True,
+    "uuidRepresentation": "standard",
+}
+
+_client: Optional[AsyncIOMotorClient] = None
+_database: Optional[AsyncIOMotorDatabase] = None
+
+def connect_to_mongo(mongodb_url: str, database_name: str) -> AsyncIOMotorDatabase:
+    """Create the process-wide client (called once from the app lifespan)"""
+    global _client, _database
+    _client = AsyncIOMotorClient(mongodb_url, **MONGO_CLIENT_OPTIONS)
+    _database = _client[database_name]
+    return _database
+
+def close_mongo_connection() -> None:
+    """Close the client and its pool"""
+    global _client, _database
+    if _client is not None:
+        _client.close()
+    _client = _database = None
+
+async def get_database() -> AsyncIOMotorDatabase:
+    """FastAPI dependency returning the shared database handle"""
+    if _database is None:
+        raise RuntimeError("MongoDB is not connected")
+    return _database
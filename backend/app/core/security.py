@@ -0,0 +1,57 @@
+"""JWT creation and verification"""
+from datetime import datetime, timedelta
+from typing import Any, Dict
+import hashlib
+import secrets
+
+import jwt
+
+from .config import get_settings
+
+settings = get_settings()
+
+# Built once; jwt.decode() only reads it
+ALGORITHMS = [settings.algorithm]
+
+# Claims every token must carry; PyJWT rejects the token when one is missing
+_DECODE_OPTIONS = {"require": ["exp", "sub", "type"], "verify_exp": True}
+
+ACCESS_TOKEN_EXPIRE_SECONDS = settings.access_token_expire_minutes * 60
+_ACCESS_TOKEN_EXPIRE = timedelta(seconds=ACCESS_TOKEN_EXPIRE_SECONDS)
+REFRESH_TOKEN_EXPIRE = timedelta(days=settings.refresh_token_expire_days)
+
+def _create_token(subject: str, token_type: str, expires_delta: timedelta) -> str:
+    now = datetime.utcnow()
+    payload = {
+        "sub": subject,
+        "type": token_type,
+        "iat": now,
+        "exp": now + expires_delta,
+        # Unique per token, so tokens issued in the same second never collide
+        "jti": secrets.token_hex(8),
+    }
+    return jwt.encode(payload, settings.secret_key, algorithm=settings.algorithm)
+
+def create_access_token(subject: str) -> str:
+    """Create a short-lived access token for a wallet address"""
+    return _create_token(subject, "access", _ACCESS_TOKEN_EXPIRE)
+
+def create_refresh_token(subject: str) -> str:
+    """Create a long-lived refresh token for a wallet address"""
+    return _create_token(subject, "refresh", REFRESH_TOKEN_EXPIRE)
+
+def hash_token(token: str) -> str:
+    """SHA-256 hex digest of a token, used to store refresh tokens"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def verify_token(token: str, token_type: str = "access") -> Dict[str, Any]:
+    """Verify a token with a single decode and return its payload.
+
+    Raises jwt.ExpiredSignatureError for expired tokens and
+    jwt.InvalidTokenError for anything else wrong, including a token
+    of the wrong type.
+    """
+    payload = jwt.decode(token, settings.secret_key, algorithms=ALGORITHMS, options=_DECODE_OPTIONS)
+    if payload["type"] != token_type:
+        raise jwt.InvalidTokenError(f"Token type must be '{token_type}'")
+    return payload
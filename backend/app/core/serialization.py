@@ -0,0 +1,29 @@
+"""orjson-based JSON serialization shared by responses and caches"""
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+from pydantic import BaseModel
+
+# Datetimes keep the naive ISO format FastAPI gives response-model routes,
+# so cached payloads and live responses carry identical timestamps
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _default(obj: Any) -> Any:
+    """Encode the types orjson does not handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="python", by_alias=False)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to JSON bytes (ObjectIds as strings)"""
+    return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+
+class ORJSONResponse(_ORJSONResponse):
+    """Default API response class, rendered with the shared orjson options"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,49 @@
+"""Per-request UTC clock"""
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Optional
+import time
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Set by RequestClockMiddleware; the datetime is built lazily on first use
+_request_ns: ContextVar[Optional[int]] = ContextVar("request_ns", default=None)
+_request_now: ContextVar[Optional[datetime]] = ContextVar("request_now", default=None)
+
+def now_utc() -> datetime:
+    """Get the current naive UTC time, snapshotted once per request.
+
+    Inside an HTTP request every call returns the same value; outside one
+    (startup, background tasks, scripts) it falls back to datetime.utcnow().
+    """
+    ns = _request_ns.get()
+    if ns is None:
+        return datetime.utcnow()
+    now = _request_now.get()
+    if now is None:
+        now = _EPOCH + timedelta(microseconds=ns // 1000)
+        _request_now.set(now)
+    return now
+
+async def get_now() -> datetime:
+    """FastAPI dependency returning the request's now_utc() snapshot"""
+    return now_utc()
+
+class RequestClockMiddleware:
+    """ASGI middleware that snapshots the clock at the start of each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ns_token = _request_ns.set(time.time_ns())
+        now_token = _request_now.set(None)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_now.reset(now_token)
+            _request_ns.reset(ns_token)
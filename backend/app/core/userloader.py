@@ -0,0 +1,69 @@
+"""Request-scoped batching of user lookups"""
+import asyncio
+from typing import Any, Dict, Optional, Set
+
+from .database import get_database
+
+class UserLoader:
+    """Coalesce user lookups by wallet address into a single $in query.
+
+    Addresses must already be lowercase, as stored in the users collection.
+
+    Every load() issued during the same event-loop tick is resolved by one
+    db.users.find(); results are memoized for the lifetime of the loader
+    (one request), so repeated lookups of the same wallet cost nothing.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._cache: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._scheduled = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, wallet_address: str) -> Optional[Dict[str, Any]]:
+        """Get the user document for a wallet, or None if there is none"""
+        if wallet_address in self._cache:
+            return self._cache[wallet_address]
+
+        future = self._pending.get(wallet_address)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[wallet_address] = loop.create_future()
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon(self._dispatch)
+        return await future
+
+    def prime(self, wallet_address: str, user: Optional[Dict[str, Any]]) -> None:
+        """Seed the memo with a document fetched elsewhere in the request"""
+        self._cache[wallet_address] = user
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        self._scheduled = False
+        task = asyncio.ensure_future(self._flush(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, pending: Dict[str, asyncio.Future]) -> None:
+        try:
+            users = await self._db.users.find(
+                {"wallet_address": {"$in": list(pending)}}
+            ).to_list(len(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_wallet = {user["wallet_address"]: user for user in users}
+        for wallet_address, future in pending.items():
+            user = by_wallet.get(wallet_address)
+            self._cache[wallet_address] = user
+            if not future.done():
+                future.set_result(user)
+
+async def get_user_loader() -> UserLoader:
+    """FastAPI dependency; FastAPI caches it, so there is one loader per request"""
+    return UserLoader(await get_database())
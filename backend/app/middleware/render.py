@@ -0,0 +1,49 @@
+"""Response headers for the Render deployment"""
+import itertools
+import time
+
+from loguru import logger
+
+# Paths served with a shared-cache header, compared against the raw request path
+CACHEABLE = frozenset({b"/", b"/health", b"/docs", b"/openapi.json"})
+
+_STATIC_HEADERS = (
+    (b"x-server", b"ViralSafe-Render"),
+    # Keep-alive pentru a reduce cold starts
+    (b"connection", b"keep-alive"),
+)
+_CACHE_HEADER = (b"cache-control", b"public, max-age=300")
+
+# Only one request in LOG_SAMPLE_RATE is logged
+LOG_SAMPLE_RATE = 100
+
+class RenderOptimizeMiddleware:
+    """ASGI middleware adding timing, server and cache headers to HTTP responses"""
+
+    def __init__(self, app):
+        self.app = app
+        self._requests = itertools.count()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        path = scope.get("raw_path") or scope["path"].encode()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                process_time = (time.perf_counter_ns() - start) / 1e9
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-process-time", str(process_time).encode()))
+                headers.extend(_STATIC_HEADERS)
+                if path in CACHEABLE:
+                    headers.append(_CACHE_HEADER)
+                message = {**message, "headers": headers}
+
+                if next(self._requests) % LOG_SAMPLE_RATE == 0:
+                    logger.debug(f"Request: {scope['method']} {scope['path']} - {process_time:.3f}s")
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -1,12 +1,21 @@
-from pydantic import BaseModel, Field, HttpUrl, validator
-from typing import Optional, List, Dict, Any, Union
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, HttpUrl, TypeAdapter
+from typing import Annotated, Optional, List, Union
 from datetime import datetime
-from bson import ObjectId
-from enum import Enum
+from enum import StrEnum
 
-from .user import PyObjectId
+from ..core.time_utils import now_utc
+from .user import PyObjectId, WALLET_RE
 
-class PostType(str, Enum):
+_HASH_STRIP = str.maketrans('', '', '#')
+
+def _normalize_hashtags(v: List[str]) -> List[str]:
+    """Lowercase hashtags, strip '#' and drop empty entries"""
+    return [tag.translate(_HASH_STRIP).lower() for tag in v if tag]
+
+# Shared by PostTags, PostCreate and PostUpdate: one core schema for all three
+Hashtags = Annotated[List[str], Field(max_length=10), AfterValidator(_normalize_hashtags)]
+
+class PostType(StrEnum):
     """Post content types"""
     TEXT = "text"
     IMAGE = "image"
@@ -15,7 +24,7 @@ class PostType(str, Enum):
     GIF = "gif"
     MEME = "meme"
 
-class PostStatus(str, Enum):
+class PostStatus(StrEnum):
     """Post moderation status"""
     DRAFT = "draft"
     PUBLISHED = "published"
@@ -25,7 +34,7 @@ class PostStatus(str, Enum):
     REMOVED = "removed"
     VIRAL = "viral"  # Special status for viral content
 
-class VoteType(str, Enum):
+class VoteType(StrEnum):
     """Vote types"""
     UP = "up"    # Pozitiv
     DOWN = "down" # Negativ
@@ -43,6 +52,8 @@ class MediaFile(BaseModel):
     ipfs_hash: Optional[str] = None
     thumbnail_url: Optional[str] = None
     thumbnail_ipfs_hash: Optional[str] = None
+    
+    model_config = ConfigDict(frozen=True)
 
 class PostMetrics(BaseModel):
     """Post engagement metrics"""
@@ -58,8 +69,9 @@ class PostMetrics(BaseModel):
     engagement_rate: float = 0.0
     virality_index: float = 0.0  # 0-100 scale
 
- class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "up_votes": 150,
                 "down_votes": 10,
@@ -70,6 +82,7 @@ class PostMetrics(BaseModel):
                 "engagement_rate": 85.5
             }
         }
+    )
 
 class NFTMetadata(BaseModel):
     """NFT metadata for viral posts"""
@@ -85,25 +98,45 @@ class NFTMetadata(BaseModel):
     current_owner: Optional[str] = None
     last_sale_price: Optional[float] = None
     last_sale_date: Optional[datetime] = None
+    
+    model_config = ConfigDict(frozen=True)
 
 class PostTags(BaseModel):
     """Post categorization tags"""
     category: Optional[str] = None  # funny, music, dance, etc.
-    hashtags: List[str] = Field(default_factory=list)
+    hashtags: Hashtags = Field(default_factory=list)
     mentions: List[str] = Field(default_factory=list)  # @username mentions
     trending_topics: List[str] = Field(default_factory=list)
     ai_generated_tags: List[str] = Field(default_factory=list)
     
-    @validator('hashtags')
-    def validate_hashtags(cls, v):
-        return [tag.lower().replace('#', '') for tag in v if tag]
+    model_config = ConfigDict(frozen=True)
+
+class LocationData(BaseModel):
+    """Geographic info captured at post time"""
+    country: Optional[str] = None
+    region: Optional[str] = None
+    city: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    
+    model_config = ConfigDict(frozen=True, extra='allow')
+
+class DeviceInfo(BaseModel):
+    """Device/browser info captured at post time"""
+    user_agent: Optional[str] = None
+    platform: Optional[str] = None  # web, ios, android
+    os: Optional[str] = None
+    browser: Optional[str] = None
+    device_type: Optional[str] = None  # mobile, tablet, desktop
+    
+    model_config = ConfigDict(frozen=True, extra='allow')
 
 # Database Model
 class PostInDB(BaseModel):
     """Post model for database storage"""
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     author_id: PyObjectId = Field(...)
-    author_wallet: str = Field(...)
+    author_wallet: str = Field(..., pattern=WALLET_RE.pattern)
     
     # Content
     title: Optional[str] = Field(None, max_length=200)
@@ -122,8 +155,8 @@ class PostInDB(BaseModel):
     nft_metadata: Optional[NFTMetadata] = None
     
     # Timestamps
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=now_utc)
+    updated_at: datetime = Field(default_factory=now_utc)
     published_at: Optional[datetime] = None
     viral_at: Optional[datetime] = None  # Când a devenit viral
     
@@ -134,15 +167,14 @@ class PostInDB(BaseModel):
     moderated_at: Optional[datetime] = None
     
     # Analytics
-    location_data: Optional[Dict[str, Any]] = None  # Geographic info
-    device_info: Optional[Dict[str, Any]] = None    # Device/browser info
+    location_data: Optional[LocationData] = None  # Geographic info
+    device_info: Optional[DeviceInfo] = None      # Device/browser info
     referrer: Optional[str] = None
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
-        schema_extra = {
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_schema_extra={
             "example": {
                 "author_wallet": "0x742d35Cc6634C0532925a3b8D83c4E123456789a",
                 "title": "My Viral Dance Challenge",
@@ -151,6 +183,7 @@ class PostInDB(BaseModel):
                 "status": "published"
             }
         }
+    )
 
 # API Models
 class PostCreate(BaseModel):
@@ -158,25 +191,15 @@ class PostCreate(BaseModel):
     title: Optional[str] = Field(None, max_length=200)
     content: str = Field(..., min_length=1, max_length=2000)
     content_type: PostType = PostType.TEXT
-    hashtags: List[str] = Field(default_factory=list, max_items=10)
+    hashtags: Hashtags = Field(default_factory=list)
     category: Optional[str] = None
-    
-    @validator('hashtags')
-    def validate_hashtags(cls, v):
-        return [tag.lower().replace('#', '') for tag in v if tag][:10]
 
 class PostUpdate(BaseModel):
     """Post update model"""
     title: Optional[str] = Field(None, max_length=200)
     content: Optional[str] = Field(None, min_length=1, max_length=2000)
-    hashtags: Optional[List[str]] = Field(None, max_items=10)
+    hashtags: Optional[Hashtags] = None
     category: Optional[str] = None
-    
-    @validator('hashtags')
-    def validate_hashtags(cls, v):
-        if v is not None:
-            return [tag.lower().replace('#', '') for tag in v if tag][:10]
-        return v
 
 class PostResponse(BaseModel):
     """Post response model for API"""
@@ -186,7 +209,7 @@ class PostResponse(BaseModel):
     author_username: Optional[str] = None  # Populated via join
     author_avatar: Optional[str] = None
     
-    title: Optional[str]
+    title: Optional[str] = None
     content: str
     content_type: PostType
     media_files: List[MediaFile]
@@ -194,20 +217,17 @@ class PostResponse(BaseModel):
     status: PostStatus
     tags: PostTags
     metrics: PostMetrics
-    nft_metadata: Optional[NFTMetadata]
+    nft_metadata: Optional[NFTMetadata] = None
     
     created_at: datetime
     updated_at: datetime
-    published_at: Optional[datetime]
-    viral_at: Optional[datetime]
+    published_at: Optional[datetime] = None
+    viral_at: Optional[datetime] = None
     
     # User interaction state (populated based on current user)
     user_vote: Optional[VoteType] = None
     user_has_voted: bool = False
     user_can_mint: bool = False
-    
-    class Config:
-        json_encoders = {ObjectId: str}
 
 class PostListResponse(BaseModel):
     """Paginated post list response"""
@@ -245,13 +265,13 @@ class VoteInDB(BaseModel):
     tokens_spent: float = 0.0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True
+    )
 
 # Feed and discovery models
-class FeedType(str, Enum):
+class FeedType(StrEnum):
     """Feed algorithm types"""
     TRENDING = "trending"    # Sorted by viral score
     LATEST = "latest"        # Most recent posts
@@ -284,4 +304,7 @@ class TrendingFeedResponse(BaseModel):
     size: int
     pages: int
     algorithm_version: str = "v1.0"
-    last_updated: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    last_updated: datetime = Field(default_factory=now_utc)
+
+# Built once at import; the feed service validates stored posts through it
+POST_IN_DB_ADAPTER = TypeAdapter(PostInDB)
@@ -1,33 +1,69 @@
-from pydantic import BaseModel, Field, EmailStr, validator
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, GetCoreSchemaHandler, GetJsonSchemaHandler, field_validator
+from pydantic_core import core_schema
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from bson import ObjectId
-from enum import Enum
+from bson.errors import InvalidId
+from enum import StrEnum
+import re
+
+from ..core.time_utils import now_utc
+
+WALLET_RE = re.compile(r"^0x[0-9a-fA-F]{40}$")
+_USER_RE = re.compile(r"^[a-z0-9]{3,30}$")
+
+def canonical_wallet(v: str) -> str:
+    """Validate a wallet address and lowercase it"""
+    if not WALLET_RE.fullmatch(v):
+        raise ValueError('Wallet address must be 0x followed by 40 hex characters')
+    return v.lower()
+
+# Cheap shape check for stored emails; full validation runs on write paths only
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+def _validate_email_strict(v: Optional[str]) -> Optional[str]:
+    """Fully validate an email address (email-validator is imported on first use)"""
+    if v is None:
+        return v
+    from email_validator import EmailNotValidError, validate_email
+    try:
+        return validate_email(v, check_deliverability=False).normalized
+    except EmailNotValidError as e:
+        raise ValueError(str(e))
 
 class PyObjectId(ObjectId):
     """Custom ObjectId type for Pydantic"""
     @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
+    def __get_pydantic_core_schema__(cls, source_type: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls.validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(str, when_used="json"),
+        )
 
     @classmethod
-    def validate(cls, v):
-        if not ObjectId.is_valid(v):
-            raise ValueError("Invalid ObjectId")
-        return ObjectId(v)
+    def __get_pydantic_json_schema__(cls, schema: core_schema.CoreSchema, handler: GetJsonSchemaHandler) -> Dict[str, Any]:
+        return {"type": "string"}
 
     @classmethod
-    def __modify_schema__(cls, field_schema):
-        field_schema.update(type="string")
+    def validate(cls, v):
+        # Documents loaded from Mongo already carry ObjectId instances
+        if isinstance(v, ObjectId):
+            return v
+        if (isinstance(v, str) and len(v) == 24) or (isinstance(v, bytes) and len(v) == 12):
+            try:
+                return ObjectId(v)
+            except InvalidId:
+                pass
+        raise ValueError("Invalid ObjectId")
 
-class UserRole(str, Enum):
+class UserRole(StrEnum):
     """User roles"""
     USER = "user"
     CREATOR = "creator"
     MODERATOR = "moderator"
     ADMIN = "admin"
 
-class UserStatus(str, Enum):
+class UserStatus(StrEnum):
     """User status"""
     ACTIVE = "active"
     SUSPENDED = "suspended"
@@ -41,6 +77,8 @@ class SocialLinks(BaseModel):
     instagram: Optional[str] = None
     youtube: Optional[str] = None
     discord: Optional[str] = None
+    
+    model_config = ConfigDict(frozen=True)
 
 class UserStats(BaseModel):
     """User statistics"""
@@ -56,6 +94,8 @@ class UserStats(BaseModel):
     following_count: int = 0
     level: int = 1
     
+    model_config = ConfigDict(frozen=True)
+    
 class UserPreferences(BaseModel):
     """User preferences and settings"""
     email_notifications: bool = True
@@ -64,13 +104,15 @@ class UserPreferences(BaseModel):
     auto_stake_rewards: bool = False
     preferred_language: str = "en"
     theme: str = "dark"  # dark, light, auto
+    
+    model_config = ConfigDict(frozen=True)
 
 # Database Model
 class UserInDB(BaseModel):
     """User model for database storage"""
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     wallet_address: str = Field(..., min_length=42, max_length=42)
-    email: Optional[EmailStr] = None
+    email: Optional[str] = Field(None, pattern=_EMAIL_RE.pattern)
     username: str = Field(..., min_length=3, max_length=30)
     display_name: Optional[str] = Field(None, max_length=50)
     bio: Optional[str] = Field(None, max_length=500)
@@ -100,20 +142,24 @@ class UserInDB(BaseModel):
     nft_count: int = 0
     
     # Timestamps
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=now_utc)
+    updated_at: datetime = Field(default_factory=now_utc)
     last_login: Optional[datetime] = None
     email_verified_at: Optional[datetime] = None
     
     # Authentication
     nonce: Optional[str] = None  # Pentru Web3 signature verification
-    refresh_token: Optional[str] = None
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
-        schema_extra = {
+    @field_validator('wallet_address')
+    @classmethod
+    def lowercase_wallet_address(cls, v):
+        # Stored lowercase so reads can match without normalizing
+        return v.lower()
+    
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_schema_extra={
             "example": {
                 "wallet_address": "0x742d35Cc6634C0532925a3b8D83c4E123456789a",
                 "username": "viral_creator",
@@ -124,52 +170,68 @@ class UserInDB(BaseModel):
                 "is_verified": True
             }
         }
+    )
 
 # API Models
 class UserCreate(BaseModel):
     """User creation model"""
     wallet_address: str = Field(..., min_length=42, max_length=42)
     username: str = Field(..., min_length=3, max_length=30)
-    email: Optional[EmailStr] = None
+    email: Optional[str] = Field(None, pattern=_EMAIL_RE.pattern)
     display_name: Optional[str] = Field(None, max_length=50)
     bio: Optional[str] = Field(None, max_length=500)
     
-    @validator('wallet_address')
+    @field_validator('email')
+    @classmethod
+    def validate_email(cls, v):
+        return _validate_email_strict(v)
+    
+    @field_validator('wallet_address')
+    @classmethod
     def validate_wallet_address(cls, v):
-        if not v.startswith('0x'):
-            raise ValueError('Wallet address must start with 0x')
-        return v.lower()
+        return canonical_wallet(v)
     
-    @validator('username')
+    @field_validator('username')
+    @classmethod
     def validate_username(cls, v):
-        if not v.isalnum():
+        v = v.lower()
+        if not _USER_RE.fullmatch(v):
             raise ValueError('Username must be alphanumeric')
-        return v.lower()
+        return v
 
 class UserUpdate(BaseModel):
     """User update model"""
     username: Optional[str] = Field(None, min_length=3, max_length=30)
     display_name: Optional[str] = Field(None, max_length=50)
     bio: Optional[str] = Field(None, max_length=500)
-    email: Optional[EmailStr] = None
+    email: Optional[str] = Field(None, pattern=_EMAIL_RE.pattern)
     social_links: Optional[SocialLinks] = None
     preferences: Optional[UserPreferences] = None
     
-    @validator('username')
+    @field_validator('email')
+    @classmethod
+    def validate_email(cls, v):
+        return _validate_email_strict(v)
+    
+    @field_validator('username')
+    @classmethod
     def validate_username(cls, v):
-        if v and not v.isalnum():
+        if not v:
+            return v
+        v = v.lower()
+        if not _USER_RE.fullmatch(v):
             raise ValueError('Username must be alphanumeric')
-        return v.lower() if v else v
+        return v
 
 class UserResponse(BaseModel):
     """User response model for API"""
     id: str
     wallet_address: str
     username: str
-    display_name: Optional[str]
-    bio: Optional[str]
-    avatar_url: Optional[str]
-    banner_url: Optional[str]
+    display_name: Optional[str] = None
+    bio: Optional[str] = None
+    avatar_url: Optional[str] = None
+    banner_url: Optional[str] = None
     role: UserRole
     status: UserStatus
     is_verified: bool
@@ -181,10 +243,7 @@ class UserResponse(BaseModel):
     staked_balance: float
     nft_count: int
     created_at: datetime
-    last_login: Optional[datetime]
-    
-    class Config:
-        json_encoders = {ObjectId: str}
+    last_login: Optional[datetime] = None
 
 class UserListResponse(BaseModel):
     """Paginated user list response"""
@@ -198,15 +257,15 @@ class UserPublicProfile(BaseModel):
     """Public user profile (limited info)"""
     id: str
     username: str
-    display_name: Optional[str]
-    bio: Optional[str]
-    avatar_url: Optional[str]
-    banner_url: Optional[str]
+    display_name: Optional[str] = None
+    bio: Optional[str] = None
+    avatar_url: Optional[str] = None
+    banner_url: Optional[str] = None
     is_verified: bool
     is_creator: bool
     social_links: SocialLinks
     stats: UserStats
     created_at: datetime
-    
-    class Config:
-        json_encoders = {ObjectId: str}
\ No newline at end of file
+
+# Built once at import; get_current_user validates stored users through it
+USER_IN_DB_ADAPTER = TypeAdapter(UserInDB)
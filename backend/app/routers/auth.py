@@ -1,28 +1,75 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import datetime, timedelta
-import secrets
+import os
+import threading
+import time
 import jwt
-from eth_account.messages import encode_defunct
+from cachetools import TTLCache
+from pymongo import ReturnDocument
+from eth_account.messages import _hash_eip191_message, encode_defunct
 from eth_account import Account
+from eth_keys.exceptions import BadSignature
+from loguru import logger
+from redis.exceptions import RedisError
 import hashlib
 
+try:
+    # Native libsecp256k1 recovery; eth_account stays as the fallback backend
+    import coincurve
+    from eth_hash.auto import keccak
+except ImportError:
+    coincurve = None
+
 from ..core.config import get_settings
-from ..models.user import UserCreate, UserResponse, UserInDB
+from ..models.user import UserCreate, UserResponse, UserInDB, USER_IN_DB_ADAPTER, canonical_wallet
 from ..core.database import get_database
-from ..core.security import create_access_token, create_refresh_token, verify_token
+from ..core.cache import get_redis
+from ..core.userloader import UserLoader, get_user_loader
+from ..core.time_utils import get_now
+from ..core.security import (
+    ACCESS_TOKEN_EXPIRE_SECONDS,
+    REFRESH_TOKEN_EXPIRE,
+    create_access_token,
+    create_refresh_token,
+    hash_token,
+    verify_token,
+)
 
 router = APIRouter()
 security = HTTPBearer()
 settings = get_settings()
 
+# last_login is written at most once per wallet within this window
+LAST_LOGIN_THROTTLE_SECONDS = 60
+
+# Verified access-token payloads keyed by a truncated SHA-256 of the token
+_payload_cache: TTLCache = TTLCache(maxsize=10000, ttl=30)
+
+# Message signed by the wallet; filled per nonce request by create_auth_message
+_AUTH_MSG_TMPL: str = """🚀 ViralSafe Authentication
+
+Wallet: {wallet}
+Nonce: {nonce}
+Timestamp: {ts}
+
+Sign this message to authenticate with ViralSafe Platform.
+This request will not trigger any blockchain transaction or cost any gas fees.
+
+Security: This signature proves you own this wallet address."""
+
 # Request/Response Models
 class AuthRequest(BaseModel):
     """Web3 authentication request"""
     wallet_address: str = Field(..., min_length=42, max_length=42)
     
+    @field_validator('wallet_address')
+    @classmethod
+    def validate_wallet_address(cls, v):
+        return canonical_wallet(v)
+    
 class NonceResponse(BaseModel):
     """Nonce response for wallet signature"""
     nonce: str
@@ -35,6 +82,11 @@ class SignatureRequest(BaseModel):
     signature: str
     nonce: str
     user_data: Optional[UserCreate] = None  # Pentru noi utilizatori
+    
+    @field_validator('wallet_address')
+    @classmethod
+    def validate_wallet_address(cls, v):
+        return canonical_wallet(v)
 
 class AuthResponse(BaseModel):
     """Authentication response"""
@@ -54,44 +106,148 @@ class LogoutRequest(BaseModel):
     refresh_token: Optional[str] = None
 
 # Helper functions
+class _NoncePool:
+    """Random 16-byte nonces sliced from one os.urandom() batch per 1024 nonces"""
+    
+    NONCE_SIZE = 16
+    BATCH_SIZE = 16384
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = b""
+        self._offset = 0
+        self._pid = None
+    
+    def next16(self) -> bytes:
+        with self._lock:
+            # Refill when exhausted, and after a fork so workers never share bytes
+            if self._offset >= len(self._buffer) or self._pid != os.getpid():
+                self._buffer = os.urandom(self.BATCH_SIZE)
+                self._offset = 0
+                self._pid = os.getpid()
+            start = self._offset
+            self._offset = start + self.NONCE_SIZE
+            return self._buffer[start:self._offset]
+
+_POOL = _NoncePool()
+
 def generate_nonce() -> str:
     """Generate secure random nonce"""
-    return secrets.token_hex(16)
+    return _POOL.next16().hex()
 
-def create_auth_message(wallet_address: str, nonce: str) -> str:
+def create_auth_message(wallet_address: str, nonce: str, now: Optional[datetime] = None) -> str:
     """Create standardized message for wallet signature"""
-    timestamp = datetime.utcnow().isoformat()
-    return f"""🚀 ViralSafe Authentication
+    return _AUTH_MSG_TMPL.format_map({
+        "wallet": wallet_address,
+        "nonce": nonce,
+        "ts": (now or datetime.utcnow()).isoformat()
+    })
 
-Wallet: {wallet_address}
-Nonce: {nonce}
-Timestamp: {timestamp}
+def eip191_digest(message: str) -> bytes:
+    """Compute the EIP-191 (personal_sign) digest of a text message"""
+    return _hash_eip191_message(encode_defunct(text=message))
 
-Sign this message to authenticate with ViralSafe Platform.
-This request will not trigger any blockchain transaction or cost any gas fees.
+def recover_address(digest: bytes, signature: str) -> str:
+    """Recover the signer address (lowercase hex) from an EIP-191 digest.
 
-Security: This signature proves you own this wallet address."""
+    Malformed signatures raise ValueError whichever backend is in use.
+    """
+    sig = bytes.fromhex(signature[2:] if signature[:2].lower() == "0x" else signature)
+    if len(sig) != 65:
+        raise ValueError("Signature must be 65 bytes")
+    
+    if coincurve is None:
+        return Account._recover_hash(digest, signature=sig).lower()
+    
+    v = sig[64]
+    recovery_id = v - 27 if v >= 27 else v
+    if recovery_id not in (0, 1):
+        raise ValueError("Invalid signature recovery id")
+    
+    public_key = coincurve.PublicKey.from_signature_and_message(sig[:64] + bytes([recovery_id]), digest, hasher=None)
+    return "0x" + keccak(public_key.format(compressed=False)[1:])[-20:].hex()
 
-def verify_signature(message: str, signature: str, wallet_address: str) -> bool:
-    """Verify wallet signature"""
+def verify_signature(message: str, signature: str, wallet_address: str, digest: Optional[bytes] = None) -> bool:
+    """Verify wallet signature (pass the precomputed EIP-191 digest when available)"""
+    if digest is None:
+        digest = eip191_digest(message)
+    
+    # Recover address from signature; malformed signatures raise ValueError,
+    # unrecoverable ones BadSignature (eth_account fallback)
     try:
-        # Encode message for Ethereum signature verification
-        encoded_message = encode_defunct(text=message)
-        
-        # Recover address from signature
-        recovered_address = Account.recover_message(encoded_message, signature=signature)
-        
-        # Compare addresses (case insensitive)
-        return recovered_address.lower() == wallet_address.lower()
-    except Exception as e:
-        print(f"Signature verification error: {e}")
+        recovered_address = recover_address(digest, signature)
+    except (ValueError, BadSignature):
+        logger.warning(f"Signature verification failed for {wallet_address}")
         return False
+    
+    # recover_address() returns lowercase hex
+    return recovered_address == wallet_address.lower()
+
+def user_response_payload(user: dict) -> dict:
+    """Shape a user document for UserResponse (extra fields are dropped by response_model)"""
+    return {**user, "id": str(user["_id"])}
+
+def auth_response_payload(user: dict, access_token: str, refresh_token: str, is_new_user: bool = False) -> dict:
+    """Build an AuthResponse-shaped dict; FastAPI validates it once against response_model"""
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_SECONDS,
+        "user": user_response_payload(user),
+        "is_new_user": is_new_user
+    }
+
+async def store_refresh_token(db, refresh_token: str, wallet_address: str, now: datetime) -> None:
+    """Record an issued refresh token; Mongo's TTL monitor removes it at expiry"""
+    await db.refresh_tokens.insert_one({
+        "token_hash": hash_token(refresh_token),
+        "wallet_address": wallet_address,
+        "expires_at": now + REFRESH_TOKEN_EXPIRE
+    })
+
+async def _last_login_due(wallet_address: str) -> bool:
+    """Claim the per-wallet Redis marker; True when last_login should be written.
+
+    The marker only throttles writes, so when Redis is down or not
+    connected this fails open and the login is recorded.
+    """
+    try:
+        cache = await get_redis()
+        return bool(await cache.set(f"ll:{wallet_address}", "1", ex=LAST_LOGIN_THROTTLE_SECONDS, nx=True))
+    except (RedisError, RuntimeError) as e:
+        logger.warning(f"last_login throttle unavailable, writing unthrottled: {e}")
+        return True
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current authenticated user from JWT token"""
+def _verify_cached(token: str) -> Optional[dict]:
+    """verify_token() with a short-lived cache of verified payloads"""
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    payload = _payload_cache.get(key)
+    if payload is not None:
+        # Cached entries can outlive the token; re-check expiry on every hit
+        if payload["exp"] <= time.time():
+            _payload_cache.pop(key, None)
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return payload
+    
+    payload = verify_token(token)
+    if payload is not None:
+        _payload_cache[key] = payload
+    return payload
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    loader: UserLoader = Depends(get_user_loader),
+    now: datetime = Depends(get_now)
+):
+    """Get current authenticated user from JWT token.
+
+    The document is kept in the request's UserLoader, so handlers that
+    load the same wallet again do not query Mongo.
+    """
     try:
         token = credentials.credentials
-        payload = verify_token(token)
+        payload = _verify_cached(token)
         
         if payload is None:
             raise HTTPException(
@@ -107,9 +263,18 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 detail="Invalid token payload"
             )
         
-        # Get user from database
+        # Get user from database; last login is only written when the
+        # per-wallet Redis marker has expired
         db = await get_database()
-        user = await db.users.find_one({"wallet_address": wallet_address.lower()})
+        if await _last_login_due(wallet_address):
+            user = await db.users.find_one_and_update(
+                {"wallet_address": wallet_address},
+                {"$set": {"last_login": now}},
+                return_document=ReturnDocument.AFTER
+            )
+            loader.prime(wallet_address, user)
+        else:
+            user = await loader.load(wallet_address)
         
         if user is None:
             raise HTTPException(
@@ -117,13 +282,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 detail="User not found"
             )
         
-        # Update last login
-        await db.users.update_one(
-            {"_id": user["_id"]},
-            {"$set": {"last_login": datetime.utcnow()}}
-        )
-        
-        return UserInDB(**user)
+        # Documents come from our own collection; production skips re-validation,
+        # other environments validate so schema drift still surfaces
+        if settings.lean_user_construction:
+            return UserInDB.model_construct(**user)
+        return USER_IN_DB_ADAPTER.validate_python(user)
         
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -145,12 +308,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 # Routes
 @router.post("/request-nonce", response_model=NonceResponse)
-async def request_nonce(request: AuthRequest):
+async def request_nonce(request: AuthRequest, now: datetime = Depends(get_now)):
     """Request nonce for wallet signature authentication"""
     try:
-        wallet_address = request.wallet_address.lower()
+        wallet_address = request.wallet_address
         nonce = generate_nonce()
-        message = create_auth_message(wallet_address, nonce)
+        message = create_auth_message(wallet_address, nonce, now)
         
         # Store nonce in database with expiration (5 minutes)
         db = await get_database()
@@ -160,8 +323,9 @@ async def request_nonce(request: AuthRequest):
                 "$set": {
                     "nonce": nonce,
                     "message": message,
-                    "created_at": datetime.utcnow(),
-                    "expires_at": datetime.utcnow() + timedelta(minutes=5)
+                    "eip191_digest": eip191_digest(message),
+                    "created_at": now,
+                    "expires_at": now + timedelta(minutes=5)
                 }
             },
             upsert=True
@@ -180,44 +344,38 @@ async def request_nonce(request: AuthRequest):
         )
 
 @router.post("/verify-signature", response_model=AuthResponse)
-async def verify_signature_and_login(request: SignatureRequest):
+async def verify_signature_and_login(request: SignatureRequest, now: datetime = Depends(get_now)):
     """Verify wallet signature and authenticate user"""
     try:
-        wallet_address = request.wallet_address.lower()
+        wallet_address = request.wallet_address
         
-        # Get nonce from database
+        # Atomically consume the nonce; matches only if it is current and unexpired
         db = await get_database()
-        nonce_doc = await db.auth_nonces.find_one({"wallet_address": wallet_address})
+        nonce_doc = await db.auth_nonces.find_one_and_delete({
+            "wallet_address": wallet_address,
+            "nonce": request.nonce,
+            "expires_at": {"$gt": now}
+        })
         
         if not nonce_doc:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Nonce not found. Please request a new nonce."
-            )
-        
-        # Check nonce expiration
-        if datetime.utcnow() > nonce_doc["expires_at"]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Nonce has expired. Please request a new nonce."
-            )
-        
-        # Verify nonce matches
-        if nonce_doc["nonce"] != request.nonce:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid nonce"
+                detail="Invalid or expired nonce. Please request a new nonce."
             )
         
         # Verify signature
-        if not verify_signature(nonce_doc["message"], request.signature, wallet_address):
+        if not verify_signature(nonce_doc["message"], request.signature, wallet_address, nonce_doc.get("eip191_digest")):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid signature"
             )
         
-        # Check if user exists
-        user = await db.users.find_one({"wallet_address": wallet_address})
+        # Check if user exists (updating last login for existing users)
+        user = await db.users.find_one_and_update(
+            {"wallet_address": wallet_address},
+            {"$set": {"last_login": now}},
+            return_document=ReturnDocument.AFTER
+        )
         is_new_user = False
         
         if not user:
@@ -229,7 +387,7 @@ async def verify_signature_and_login(request: SignatureRequest):
                 )
             
             # Check username availability
-            existing_username = await db.users.find_one({"username": request.user_data.username.lower()})
+            existing_username = await db.users.find_one({"username": request.user_data.username})
             if existing_username:
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT,
@@ -239,46 +397,28 @@ async def verify_signature_and_login(request: SignatureRequest):
             # Create new user document
             new_user = UserInDB(
                 wallet_address=wallet_address,
-                username=request.user_data.username.lower(),
+                username=request.user_data.username,
                 display_name=request.user_data.display_name,
                 bio=request.user_data.bio,
                 email=request.user_data.email,
-                created_at=datetime.utcnow(),
-                last_login=datetime.utcnow()
+                created_at=now,
+                updated_at=now,
+                last_login=now
             )
             
-            result = await db.users.insert_one(new_user.dict(by_alias=True, exclude_unset=True))
-            user = await db.users.find_one({"_id": result.inserted_id})
+            # Store the full document (defaults included) and reuse it for the response
+            user = new_user.model_dump(by_alias=True)
+            await db.users.insert_one(user)
             is_new_user = True
-        else:
-            # Update last login for existing user
-            await db.users.update_one(
-                {"_id": user["_id"]},
-                {"$set": {"last_login": datetime.utcnow()}}
-            )
-        
-        # Clean up used nonce
-        await db.auth_nonces.delete_one({"wallet_address": wallet_address})
         
         # Create tokens  
         access_token = create_access_token(subject=wallet_address)
         refresh_token = create_refresh_token(subject=wallet_address)
         
         # Store refresh token
-        await db.users.update_one(
-            {"_id": user["_id"]},
-            {"$set": {"refresh_token": refresh_token}}
-        )
+        await store_refresh_token(db, refresh_token, wallet_address, now)
         
-        user_response = UserResponse(**user)
-        
-        return AuthResponse(
-            access_token=access_token,
-            refresh_token=refresh_token,
-            expires_in=settings.access_token_expire_minutes * 60,
-            user=user_response,
-            is_new_user=is_new_user
-        )
+        return auth_response_payload(user, access_token, refresh_token, is_new_user)
         
     except HTTPException:
         raise
@@ -289,7 +429,7 @@ async def verify_signature_and_login(request: SignatureRequest):
         )
 
 @router.post("/refresh", response_model=AuthResponse)
-async def refresh_token(request: RefreshRequest):
+async def refresh_token(request: RefreshRequest, now: datetime = Depends(get_now)):
     """Refresh access token using refresh token"""
     try:
         payload = verify_token(request.refresh_token, token_type="refresh")
@@ -302,13 +442,14 @@ async def refresh_token(request: RefreshRequest):
         
         wallet_address = payload.get("sub")
         
-        # Verify refresh token in database
+        # Consume the stored refresh token; each one can be rotated only once
         db = await get_database()
-        user = await db.users.find_one({
-            "wallet_address": wallet_address,
-            "refresh_token": request.refresh_token
+        token_doc = await db.refresh_tokens.find_one_and_delete({
+            "token_hash": hash_token(request.refresh_token),
+            "wallet_address": wallet_address
         })
         
+        user = await db.users.find_one({"wallet_address": wallet_address}) if token_doc else None
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -319,23 +460,18 @@ async def refresh_token(request: RefreshRequest):
         new_access_token = create_access_token(subject=wallet_address)
         new_refresh_token = create_refresh_token(subject=wallet_address)
         
-        # Update refresh token in database
-        await db.users.update_one(
-            {"_id": user["_id"]},
-            {"$set": {"refresh_token": new_refresh_token}}
-        )
-        
-        user_response = UserResponse(**user)
+        # Store the rotated refresh token
+        await store_refresh_token(db, new_refresh_token, wallet_address, now)
         
-        return AuthResponse(
-            access_token=new_access_token,
-            refresh_token=new_refresh_token,
-            expires_in=settings.access_token_expire_minutes * 60,
-            user=user_response
-        )
+        return auth_response_payload(user, new_access_token, new_refresh_token)
         
     except HTTPException:
         raise
+    except jwt.InvalidTokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -344,15 +480,18 @@ async def refresh_token(request: RefreshRequest):
 
 @router.post("/logout")
 async def logout(request: LogoutRequest, current_user: UserInDB = Depends(get_current_user)):
-    """Logout user and invalidate refresh token"""
+    """Logout user and invalidate refresh token (all of the user's tokens if none is given)"""
     try:
         db = await get_database()
         
-        # Remove refresh token from database
-        await db.users.update_one(
-            {"_id": current_user.id},
-            {"$unset": {"refresh_token": ""}}
-        )
+        # Remove refresh token(s) from database
+        if request.refresh_token:
+            await db.refresh_tokens.delete_one({
+                "token_hash": hash_token(request.refresh_token),
+                "wallet_address": current_user.wallet_address
+            })
+        else:
+            await db.refresh_tokens.delete_many({"wallet_address": current_user.wallet_address})
         
         return {"message": "Successfully logged out"}
         
@@ -363,9 +502,19 @@ async def logout(request: LogoutRequest, current_user: UserInDB = Depends(get_cu
         )
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: UserInDB = Depends(get_current_user)):
+async def get_current_user_info(
+    current_user: UserInDB = Depends(get_current_user),
+    loader: UserLoader = Depends(get_user_loader)
+):
     """Get current authenticated user information"""
-    return UserResponse(**current_user.dict())
+    # Served from the loader memo filled by get_current_user
+    user = await loader.load(current_user.wallet_address)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user_response_payload(user)
 
 @router.get("/status")
 async def auth_status():
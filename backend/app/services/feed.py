@@ -0,0 +1,204 @@
+"""Feed assembly and trending ranking"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+from datetime import datetime
+import asyncio
+import math
+
+import numpy as np
+from bson import ObjectId
+from cachetools import TTLCache
+from loguru import logger
+
+from ..core.config import get_settings
+from ..core.serialization import dumps
+from ..core.time_utils import now_utc
+from ..models.post import (
+    FeedType, PostInDB, PostResponse, PostStatus, TrendingPost, TrendingFeedResponse,
+    POST_IN_DB_ADAPTER,
+)
+
+settings = get_settings()
+
+# Serialized, viewer-independent PostResponse payloads keyed by post id
+_post_payload_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+# (serialized page, has_next) keyed by (feed_type, page, size)
+_feed_page_cache: TTLCache = TTLCache(maxsize=1_000, ttl=30)
+
+# Upper bound on concurrent next-page prefetches so they never crowd out real requests
+_prefetch_slots = asyncio.Semaphore(32)
+_prefetch_tasks: Set[asyncio.Task] = set()
+
+# How many recent posts are considered when ranking the trending feed
+TRENDING_CANDIDATES = 500
+# Time-decay exponent for trending_score (higher = older posts drop faster)
+TRENDING_GRAVITY = 1.5
+
+VISIBLE_STATUSES = [PostStatus.PUBLISHED, PostStatus.APPROVED, PostStatus.VIRAL]
+
+# One column per metric, one row per post
+METRICS_DTYPE = np.dtype([
+    ("viral_score", "f4"),
+    ("up_votes", "i4"),
+    ("down_votes", "i4"),
+    ("total_votes", "i4"),
+    ("views", "i4"),
+    ("age_hours", "f4"),
+])
+
+# Only the fields the ranking pass reads; full documents are fetched for the page slice
+TRENDING_PROJECTION = {
+    "_id": 1,
+    "created_at": 1,
+    "metrics.viral_score": 1,
+    "metrics.up_votes": 1,
+    "metrics.down_votes": 1,
+    "metrics.total_votes": 1,
+    "metrics.views": 1,
+}
+
+async def load_trending_candidates(db, now: datetime) -> Tuple[List[ObjectId], np.recarray]:
+    """Stream projected candidate posts into a preallocated struct-of-arrays"""
+    metrics = np.empty(TRENDING_CANDIDATES, dtype=METRICS_DTYPE).view(np.recarray)
+    ids: List[ObjectId] = []
+    cursor = db.posts.find(
+        {"status": {"$in": VISIBLE_STATUSES}}, TRENDING_PROJECTION
+    ).sort("created_at", -1).limit(TRENDING_CANDIDATES)
+    async for doc in cursor:
+        m = doc.get("metrics") or {}
+        metrics[len(ids)] = (
+            m.get("viral_score", 0),
+            m.get("up_votes", 0),
+            m.get("down_votes", 0),
+            m.get("total_votes", 0),
+            m.get("views", 0),
+            (now - doc["created_at"]).total_seconds() / 3600,
+        )
+        ids.append(doc["_id"])
+    return ids, metrics[:len(ids)]
+
+def score_trending(metrics: np.recarray) -> Dict[str, np.ndarray]:
+    """Compute trending scores for all posts in one vectorized pass"""
+    age_hours = np.maximum(metrics.age_hours, 0.0)
+    viral_score = metrics.viral_score
+
+    trending_score = viral_score / np.power(age_hours + 2.0, TRENDING_GRAVITY)
+    # Average viral score gained per hour over (at most) the last 24h
+    growth_rate = viral_score / np.clip(age_hours, 1.0, 24.0)
+    virality_index = np.clip(100.0 * metrics.total_votes / settings.viral_threshold, 0.0, 100.0)
+    # Projected daily growth relative to the NFT viral threshold
+    predicted_viral_potential = np.clip(100.0 * growth_rate * 24.0 / settings.viral_threshold, 0.0, 100.0)
+
+    return {
+        "trending_score": trending_score,
+        "growth_rate": growth_rate,
+        "virality_index": virality_index,
+        "predicted_viral_potential": predicted_viral_potential,
+    }
+
+def _post_response_fields(post: PostInDB, author: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Map a stored post (plus optional author document) to PostResponse fields"""
+    fields = post.model_dump(exclude={"id", "author_id"})
+    fields["id"] = str(post.id)
+    fields["author_id"] = str(post.author_id)
+    if author:
+        fields["author_username"] = author.get("username")
+        fields["author_avatar"] = author.get("avatar_url")
+    return fields
+
+def build_trending_post(doc: Dict[str, Any], rank: int, scores: Dict[str, np.ndarray], row: int) -> TrendingPost:
+    """Materialize a TrendingPost for one ranked row"""
+    post = POST_IN_DB_ADAPTER.validate_python(doc)
+    metrics = post.metrics.model_copy(update={"virality_index": float(scores["virality_index"][row])})
+    fields = _post_response_fields(post)
+    fields["metrics"] = metrics
+    return TrendingPost(
+        **fields,
+        trending_score=float(scores["trending_score"][row]),
+        trending_rank=rank,
+        growth_rate=float(scores["growth_rate"][row]),
+        predicted_viral_potential=float(scores["predicted_viral_potential"][row]),
+    )
+
+async def get_trending_feed(db, page: int = 1, size: int = 20, now: Optional[datetime] = None) -> TrendingFeedResponse:
+    """Rank recent posts by trending score and return the requested page"""
+    now = now or now_utc()
+    ids, metrics = await load_trending_candidates(db, now)
+    scores = score_trending(metrics)
+    order = np.argsort(-scores["trending_score"], kind="stable")
+
+    start = (page - 1) * size
+    page_rows = order[start:start + size].tolist()
+    page_ids = [ids[row] for row in page_rows]
+    docs = await db.posts.find({"_id": {"$in": page_ids}}).to_list(len(page_ids))
+    docs_by_id = {doc["_id"]: doc for doc in docs}
+    posts = [
+        build_trending_post(docs_by_id[ids[row]], start + offset + 1, scores, row)
+        for offset, row in enumerate(page_rows)
+        if ids[row] in docs_by_id
+    ]
+
+    total = len(ids)
+    return TrendingFeedResponse(
+        posts=posts,
+        total=total,
+        page=page,
+        size=size,
+        pages=math.ceil(total / size) if total else 0,
+        last_updated=now,
+    )
+
+async def _prefetch_trending_page(db, page: int, size: int) -> None:
+    """Compute and cache a trending page ahead of the client asking for it"""
+    async with _prefetch_slots:
+        key = (FeedType.TRENDING, page, size)
+        if key in _feed_page_cache:
+            return
+        # Nobody awaits this task, so failures are logged here; the page is
+        # simply computed on demand when requested
+        try:
+            feed = await get_trending_feed(db, page, size)
+        except Exception:
+            logger.opt(exception=True).warning(f"Prefetch of trending page {page} (size {size}) failed")
+            return
+        _feed_page_cache[key] = (dumps(feed), page < feed.pages)
+
+async def get_trending_feed_payload(db, page: int = 1, size: int = 20) -> bytes:
+    """Get a JSON-encoded trending page and speculatively prefetch the next one"""
+    key = (FeedType.TRENDING, page, size)
+    cached = _feed_page_cache.get(key)
+    if cached is None:
+        feed = await get_trending_feed(db, page, size)
+        cached = _feed_page_cache[key] = (dumps(feed), page < feed.pages)
+    payload, has_next = cached
+
+    next_key = (FeedType.TRENDING, page + 1, size)
+    if has_next and next_key not in _feed_page_cache and not _prefetch_slots.locked():
+        task = asyncio.create_task(_prefetch_trending_page(db, page + 1, size))
+        _prefetch_tasks.add(task)
+        task.add_done_callback(_prefetch_tasks.discard)
+    return payload
+
+async def get_post_payload(db, post_id: ObjectId) -> Optional[bytes]:
+    """Get the JSON-encoded PostResponse for a post, served from cache when hot.
+
+    The cached payload carries no viewer state (user_vote, user_has_voted,
+    user_can_mint keep their defaults), so it is shared by all viewers.
+    """
+    key = str(post_id)
+    payload = _post_payload_cache.get(key)
+    if payload is not None:
+        return payload
+
+    doc = await db.posts.find_one({"_id": post_id})
+    if doc is None:
+        return None
+    author = await db.users.find_one({"_id": doc["author_id"]}, {"username": 1, "avatar_url": 1})
+
+    response = PostResponse(**_post_response_fields(POST_IN_DB_ADAPTER.validate_python(doc), author))
+    payload = dumps(response)
+    _post_payload_cache[key] = payload
+    return payload
+
+def invalidate_post(post_id: ObjectId) -> None:
+    """Drop the cached payload of a post (call after votes or edits)"""
+    _post_payload_cache.pop(str(post_id), None)
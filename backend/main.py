@@ -1,82 +1,133 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Request
+from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from functools import lru_cache
+import asyncio
+import importlib
+import importlib.util
 import uvicorn
 import os
+import sys
 import time
 import psutil
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseSettings
-import redis.asyncio as redis
-from motor.motor_asyncio import AsyncIOMotorClient
 from loguru import logger
+from fastapi_async_safe import init_app
+from pymongo.errors import PyMongoError
+from redis.exceptions import RedisError
 
-# Import routers - with error handling for missing modules
-try:
-    from app.routers import auth, posts, nft, staking, users, analytics
-    from app.core.config import get_settings
-    from app.core.database import get_database
-    from app.core.cache import get_redis
-    from app.middleware.rate_limit import RateLimitMiddleware
-    from app.middleware.metrics import MetricsMiddleware
-except ImportError as e:
-    logger.warning(f"Some modules not available: {e}")
-    # Create dummy routers for development
-    class DummyRouter:
-        def __init__(self):
-            pass
-    
-    auth = posts = nft = staking = users = analytics = DummyRouter()
+from app.core.config import get_settings
+from app.core.serialization import ORJSONResponse
+from app.core.time_utils import RequestClockMiddleware
+from app.core.database import connect_to_mongo, close_mongo_connection
+from app.core.cache import connect_to_redis, close_redis_connection
+from app.middleware.render import RenderOptimizeMiddleware
+from app.routers import auth
+
+settings = get_settings()
+
+# Sinks are written from a background thread so logging never blocks the event loop
+logger.remove()
+logger.add(sys.stderr, level=settings.log_level.upper(), enqueue=True, diagnose=False)
+
+# Routers and middleware that are not in the tree yet; each is mounted only
+# once its module exists, and import errors inside existing modules propagate
+OPTIONAL_ROUTERS = {
+    "app.routers.posts": ("/api/v1/posts", "Posts"),
+    "app.routers.nft": ("/api/v1/nft", "NFT"),
+    "app.routers.staking": ("/api/v1/staking", "Staking"),
+    "app.routers.users": ("/api/v1/users", "Users"),
+    "app.routers.analytics": ("/api/v1/analytics", "Analytics"),
+}
+OPTIONAL_MIDDLEWARE = {
+    "app.middleware.rate_limit": "RateLimitMiddleware",
+    "app.middleware.metrics": "MetricsMiddleware",
+}
+
+def _optional_module(name: str):
+    """Import a module if it exists, else return None"""
+    if importlib.util.find_spec(name) is None:
+        logger.warning(f"Module {name} not available")
+        return None
+    return importlib.import_module(name)
 
 # Global variables for database and cache connections
 database = None
 cache = None
 start_time = time.time()
 
-# Simple settings fallback
-class Settings:
-    def __init__(self):
-        self.mongodb_url = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-        self.database_name = os.getenv("DATABASE_NAME", "viralsafe")
-        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        self.environment = os.getenv("ENVIRONMENT", "development")
-        self.cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+# Refreshed by _health_watcher; health endpoints only read these
+HEALTH_CHECK_INTERVAL = 10
+_db_healthy = False
+_cache_healthy = False
 
-settings = Settings()
+# (collection, key, options) for the indexes the auth flow relies on.
+# Expired auth nonces and refresh tokens are reaped by Mongo's TTL monitor;
+# refresh tokens are stored by hash
+AUTH_INDEXES = (
+    ("auth_nonces", "expires_at", {"expireAfterSeconds": 0}),
+    ("auth_nonces", "wallet_address", {"unique": True}),
+    ("users", "wallet_address", {"unique": True}),
+    ("refresh_tokens", "token_hash", {"unique": True}),
+    ("refresh_tokens", "wallet_address", {}),
+    ("refresh_tokens", "expires_at", {"expireAfterSeconds": 0}),
+)
+
+async def create_indexes(database) -> None:
+    """Create the auth indexes (no-op when they exist); one failure doesn't skip the rest"""
+    for collection, key, options in AUTH_INDEXES:
+        try:
+            await database[collection].create_index(key, **options)
+        except PyMongoError as e:
+            logger.error(f"Index creation failed for {collection}.{key}: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle with error handling"""
-    global database, cache
+    global database, cache, _db_healthy, _cache_healthy
     
+    # Generate the OpenAPI schema now; FastAPI memoizes it in app.openapi_schema,
+    # so /openapi.json and /docs never build it on a request
     try:
-        # Initialize database connection
-        client = AsyncIOMotorClient(settings.mongodb_url)
-        database = client[settings.database_name]
-        
-        # Initialize Redis cache
-        cache = redis.from_url(settings.redis_url, decode_responses=True)
+        app.openapi()
+    except Exception:
+        logger.opt(exception=True).warning("OpenAPI schema generation failed")
+    
+    try:
+        # Initialize pooled clients, shared by requests through get_database/get_redis
+        database = connect_to_mongo(settings.mongodb_url, settings.database_name)
+        cache = connect_to_redis(settings.redis_url)
         
         # Test connections
-        await client.admin.command('ping')
+        await database.client.admin.command('ping')
         await cache.ping()
         logger.info("✅ Database and cache connections established")
+        _db_healthy = _cache_healthy = True
     except Exception as e:
         logger.error(f"❌ Connection failed: {e}")
-        # Continue without database for basic functionality
+        # Continue without database for basic functionality; dropping the shared
+        # clients makes get_database/get_redis report that they are not connected
+        close_mongo_connection()
+        await close_redis_connection()
         database = None
         cache = None
     
+    if database is not None:
+        await create_indexes(database)
+    
+    health_watcher = asyncio.create_task(_health_watcher())
+    
     yield
     
     # Cleanup connections
+    health_watcher.cancel()
+    with suppress(asyncio.CancelledError):
+        await health_watcher
     try:
-        if database:
-            client.close()
-        if cache:
-            await cache.close()
+        close_mongo_connection()
+        await close_redis_connection()
     except Exception as e:
         logger.error(f"Cleanup error: {e}")
 
@@ -87,78 +138,92 @@ app = FastAPI(
     version="0.3.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
-# Configure CORS
+# Run sync dependencies marked @async_safe on the event loop instead of the
+# threadpool; routes are wrapped at startup, so later include_router calls are covered
+init_app(app)
+
+# Configure CORS: settings.cors_origins (CORS_ORIGINS), matched by one precompiled regex
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",  # Next.js development
-        "https://*.vercel.app",   # Vercel deployments
-        "https://viralsafe.io",   # Production domain
-        "https://*.onrender.com", # Render deployments
-    ] + settings.cors_origins,
+    allow_origin_regex=settings.cors_origin_regex,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
 
-# Render optimization middleware
-@app.middleware("http")
-async def optimize_for_render(request: Request, call_next):
-    """Optimizări specifice pentru Render free tier"""
-    start_time = time.time()
-    
-    response = await call_next(request)
-    
-    process_time = time.time() - start_time
-    
-    # Add performance headers
-    response.headers["X-Process-Time"] = str(process_time)
-    response.headers["X-Server"] = "ViralSafe-Render"
-    
-    # Cache static responses
-    if request.url.path in ["/", "/health", "/docs", "/openapi.json"]:
-        response.headers["Cache-Control"] = "public, max-age=300"
-    
-    # Keep-alive pentru a reduce cold starts
-    response.headers["Connection"] = "keep-alive"
-    
-    # Log pentru monitoring
-    logger.info(f"Request: {request.method} {request.url.path} - {process_time:.3f}s")
-    
-    return response
+# Render optimization headers (X-Process-Time, Cache-Control on static routes)
+app.add_middleware(RenderOptimizeMiddleware)
 
-# Add custom middleware with error handling
-try:
-    app.add_middleware(RateLimitMiddleware)
-    app.add_middleware(MetricsMiddleware)
-except:
-    logger.warning("Custom middleware not available")
+# Add custom middleware once implemented
+for module_name, class_name in OPTIONAL_MIDDLEWARE.items():
+    module = _optional_module(module_name)
+    if module is not None:
+        app.add_middleware(getattr(module, class_name))
+
+# Outermost: snapshot the clock once per request for now_utc()
+app.add_middleware(RequestClockMiddleware)
 
 # Security scheme
 security = HTTPBearer()
 
-async def check_db_health():
-    """Check database health"""
+async def _ping_database() -> bool:
     try:
-        if database:
-            await database.command('ping')
-            return "healthy"
+        await database.command('ping')
+        return True
+    except PyMongoError as e:
+        logger.warning(f"Database ping failed: {e}")
+        return False
+
+async def _ping_redis() -> bool:
+    try:
+        await cache.ping()
+        return True
+    except RedisError as e:
+        logger.warning(f"Redis ping failed: {e}")
+        return False
+
+async def _health_watcher():
+    """Ping database and cache every HEALTH_CHECK_INTERVAL seconds"""
+    global _db_healthy, _cache_healthy
+    while True:
+        await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+        # Unexpected errors must not end the task, or the flags would freeze
+        if database is not None:
+            try:
+                _db_healthy = await _ping_database()
+            except Exception:
+                logger.opt(exception=True).error("Database health check failed")
+                _db_healthy = False
+        if cache is not None:
+            try:
+                _cache_healthy = await _ping_redis()
+            except Exception:
+                logger.opt(exception=True).error("Redis health check failed")
+                _cache_healthy = False
+
+async def check_db_health():
+    """Check database health (last background ping)"""
+    if database is None:
         return "not_configured"
-    except:
-        return "unhealthy"
+    return "healthy" if _db_healthy else "unhealthy"
 
 async def check_redis_health():
-    """Check Redis health"""
-    try:
-        if cache:
-            await cache.ping()
-            return "healthy"
+    """Check Redis health (last background ping)"""
+    if cache is None:
         return "not_configured"
-    except:
-        return "unhealthy"
+    return "healthy" if _cache_healthy else "unhealthy"
+
+@lru_cache(maxsize=1)
+def _memory_snapshot(second: int):
+    return psutil.virtual_memory()
+
+def memory_usage():
+    """psutil.virtual_memory(), sampled at most once per second"""
+    return _memory_snapshot(int(time.time() // 1))
 
 # Health check endpoint
 @app.get("/health", tags=["Health"])
@@ -179,7 +244,7 @@ async def health_check():
 async def detailed_health():
     """Detailed health check pentru monitoring extern"""
     try:
-        memory = psutil.virtual_memory()
+        memory = memory_usage()
         return {
             "status": "healthy",
             "timestamp": datetime.utcnow().isoformat(),
@@ -233,37 +298,28 @@ async def api_status():
         "cache_connected": cache is not None
     }
 
-# Include API routers with error handling
-try:
-    if hasattr(auth, 'router'):
-        app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
-    if hasattr(posts, 'router'):
-        app.include_router(posts.router, prefix="/api/v1/posts", tags=["Posts"])
-    if hasattr(nft, 'router'):
-        app.include_router(nft.router, prefix="/api/v1/nft", tags=["NFT"])
-    if hasattr(staking, 'router'):
-        app.include_router(staking.router, prefix="/api/v1/staking", tags=["Staking"])
-    if hasattr(users, 'router'):
-        app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
-    if hasattr(analytics, 'router'):
-        app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["Analytics"])
-except Exception as e:
-    logger.warning(f"Some routers not included: {e}")
-
-# WebSocket endpoint for real-time updates
-@app.websocket("/ws")
-async def websocket_endpoint(websocket):
-    """WebSocket endpoint for real-time updates"""
-    await websocket.accept()
-    try:
-        while True:
-            data = await websocket.receive_text()
-            # Process real-time updates
-            await websocket.send_text(f"ViralSafe Echo: {data}")
-    except Exception as e:
-        logger.error(f"WebSocket error: {e}")
-    finally:
-        await websocket.close()
+# Include API routers
+app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
+for module_name, (prefix, tag) in OPTIONAL_ROUTERS.items():
+    module = _optional_module(module_name)
+    if module is not None:
+        app.include_router(module.router, prefix=prefix, tags=[tag])
+
+# Echo WebSocket stub for local frontend work; real-time updates are not implemented yet
+if settings.is_development():
+    @app.websocket("/ws")
+    async def websocket_endpoint(websocket):
+        """WebSocket endpoint for real-time updates"""
+        await websocket.accept()
+        try:
+            while True:
+                data = await websocket.receive_text()
+                # Process real-time updates
+                await websocket.send_text(f"ViralSafe Echo: {data}")
+        except Exception as e:
+            logger.error(f"WebSocket error: {e}")
+        finally:
+            await websocket.close()
 
 # Error handlers
 @app.exception_handler(404)